@@ -191,3 +191,84 @@ class TestParameters(TestCase):
         self.assertEqual(repr(p), "self.lookup_file(os.path.join('files', 'filename'))")
         self.assertEqual(p.get_value(role), "LOOKUP:files/filename")
         self.assertEqual(set(p.list_role_vars(role)), set())
+
+    def test_create(self):
+        from transilience.actions import builtin
+        from dataclasses import fields
+        copy_fields = {f.name: f for f in fields(builtin.copy)}
+
+        p = parameters.Parameter.create(copy_fields["dest"], "/etc/{{ name }}")
+        self.assertIsInstance(p, parameters.ParameterTemplateString)
+
+        p = parameters.Parameter.create(copy_fields["dest"], "{{ name }}")
+        self.assertIsInstance(p, parameters.ParameterVarReference)
+        self.assertEqual(p.value, "name")
+
+        p = parameters.Parameter.create(copy_fields["src"], "{{ name }}")
+        self.assertIsInstance(p, parameters.ParameterVarFileReference)
+        self.assertEqual(p.value, "name")
+
+        p = parameters.Parameter.create(copy_fields["src"], "name")
+        self.assertIsInstance(p, parameters.ParameterFileReference)
+
+        p = parameters.Parameter.create(copy_fields["mode"], 0o644)
+        self.assertIsInstance(p, parameters.ParameterOctal)
+
+        # Comma-separated string lists are shared, but their values are not
+        apt_fields = {f.name: f for f in fields(builtin.apt)}
+        p = parameters.Parameter.create(apt_fields["name"], "vim,emacs")
+        self.assertIsInstance(p, parameters.ParameterStringList)
+        self.assertIs(p, parameters.Parameter.create(apt_fields["name"], "vim,emacs"))
+        self.assertFalse(p.constant)
+        self.assertEqual(repr(p), "['vim', 'emacs']")
+        val = p.get_value(None)
+        self.assertEqual(val, ["vim", "emacs"])
+        val.append("nano")
+        self.assertEqual(p.get_value(None), ["vim", "emacs"])
+
+        p = parameters.Parameter.create(None, [1, "{{a}}", {"b": True}])
+        self.assertEqual(repr(p), "[1, self.a, {'b': True}]")
+        self.assertFalse(p.constant)
+
+        # Lists and dicts are built anew each time, even if their contents are
+        # constant, so that actions do not share them
+        p = parameters.Parameter.create(None, [1, "a", {"b": [True]}])
+        self.assertFalse(p.constant)
+        val1 = p.get_value(None)
+        val2 = p.get_value(None)
+        self.assertEqual(val1, [1, "a", {"b": [True]}])
+        self.assertEqual(val1, val2)
+        self.assertIsNot(val1, val2)
+        self.assertIsNot(val1[2], val2[2])
+        self.assertIsNot(val1[2]["b"], val2[2]["b"])
+
+        # Parameters for scalar values are shared
+        self.assertIs(
+                parameters.Parameter.create(copy_fields["dest"], "/etc/{{ name }}"),
+                parameters.Parameter.create(copy_fields["dest"], "/etc/{{ name }}"))
+        self.assertIsNot(
+                parameters.Parameter.create(copy_fields["dest"], "{{ name }}"),
+                parameters.Parameter.create(copy_fields["src"], "{{ name }}"))
+        self.assertIs(
+                parameters.Parameter.create(copy_fields["dest"], "{{ name }}"),
+                parameters.Parameter.create(copy_fields["content"], "{{name}}"))
+
+    def test_to_jsonable(self):
+        p = parameters.Parameter.create(None, {"a": [1, "b"]})
+        self.assertEqual(p.to_jsonable(), {
+            "node": "parameter",
+            "type": "dict",
+            "value": {
+                "a": {
+                    "node": "parameter",
+                    "type": "list",
+                    "value": [
+                        {"node": "parameter", "type": "scalar", "value": 1},
+                        {"node": "parameter", "type": "scalar", "value": "b"},
+                    ],
+                },
+            },
+        })
+
+        p = parameters.ParameterOctal(0o644)
+        self.assertEqual(p.to_jsonable(), {"node": "parameter", "type": "octal", "value": "0o644"})
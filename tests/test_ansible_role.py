@@ -0,0 +1,153 @@
+from __future__ import annotations
+from unittest import TestCase
+import tempfile
+import os
+from unittest import mock
+from transilience.ansible import FilesystemRoleLoader
+
+
+TASKS = """
+- name: Install packages
+  apt:
+    name: [vim, "{{editor}}"]
+    state: present
+- name: Create directory
+  file:
+    path: /tmp/test
+    state: directory
+  notify: restart foo
+- name: Run command
+  ansible.builtin.command: echo hello
+"""
+
+HANDLERS = """
+- name: restart foo
+  systemd:
+    unit: foo
+    state: restarted
+"""
+
+
+class TestAnsibleRole(TestCase):
+    def setUp(self):
+        super().setUp()
+        self.workdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.workdir.cleanup)
+        for name, contents in (("tasks", TASKS), ("handlers", HANDLERS)):
+            path = os.path.join(self.workdir.name, "test", name)
+            os.makedirs(path)
+            with open(os.path.join(path, "main.yaml"), "wt") as fd:
+                fd.write(contents)
+
+    def load(self) -> FilesystemRoleLoader:
+        loader = FilesystemRoleLoader("test", roles_root=self.workdir.name)
+        loader.load()
+        return loader
+
+    def test_role_class(self):
+        loader = self.load()
+        role_cls = loader.get_role_class()
+        self.assertIs(loader.get_role_class(), role_cls)
+
+        role = role_cls(role_name="test", editor="emacs")
+        self.assertEqual(role.editor, "emacs")
+
+        loader.ansible_role.add_task({"name": "Noop", "noop": {}})
+        self.assertIsNot(loader.get_role_class(), role_cls)
+
+    def test_start_tasks(self):
+        loader = self.load()
+        role_cls = loader.get_role_class()
+
+        def run(editor):
+            role = role_cls(role_name="test", editor=editor)
+            with mock.patch.object(role, "add") as add:
+                role.all_facts_available()
+            res = []
+            for args, kw in add.call_args_list:
+                res.append((kw["name"], args[0]))
+                if kw["name"] == "Create directory":
+                    self.assertEqual([h.__name__ for h in kw["notify"]], ["restart foo"])
+                else:
+                    self.assertIsNone(kw["notify"])
+            return res
+
+        vim = run("vim")
+        emacs = run("emacs")
+
+        for actions in vim, emacs:
+            self.assertEqual(
+                [name for name, action in actions],
+                ["Install packages", "Create directory", "Run command"])
+
+        # Arguments depending on role variables are computed for each role
+        self.assertEqual(vim[0][1].name, ["vim", "vim"])
+        self.assertEqual(emacs[0][1].name, ["vim", "emacs"])
+        # Constant arguments are the same for all roles
+        self.assertEqual(vim[0][1].state, "present")
+        self.assertEqual(emacs[0][1].state, "present")
+        # Tasks with only constant arguments
+        for actions in vim, emacs:
+            self.assertEqual(actions[1][1].path, "/tmp/test")
+            self.assertEqual(actions[1][1].state, "directory")
+            self.assertEqual(actions[2][1].argv, ["echo", "hello"])
+
+        # Actions do not share list arguments, since they can modify them
+        self.assertIsNot(vim[2][1].argv, emacs[2][1].argv)
+        vim[2][1].argv.append("world")
+        self.assertEqual(emacs[2][1].argv, ["echo", "hello"])
+        self.assertEqual(run("vim")[2][1].argv, ["echo", "hello"])
+
+    def test_python_code(self):
+        loader = self.load()
+        code = loader.get_python_code()
+        compile(code, "test.py", "exec")
+        self.assertIn("class RestartFoo(role.Role):", code)
+        self.assertIn(
+            "self.add(builtin.apt(name=['vim', self.editor], state='present'), name='Install packages')", code)
+        self.assertIn("self.add(builtin.command(argv=['echo', 'hello']), name='Run command')", code)
+
+    def test_python_code_wrap(self):
+        loader = self.load()
+        role = loader.ansible_role
+        role.add_task({
+            "name": "Install a long list of packages",
+            "apt": {
+                "name": ["vim", "emacs", "nano", "joe", "jed", "mg", "zile", "ed", "vis", "kakoune", "neovim"],
+                "state": "present",
+            },
+        })
+        role.add_task({
+            "name": "Install more packages",
+            "apt": {"name": ["vim", "emacs", "nano", "joe", "jed", "mg", "zile", "ed", "vis"], "state": "present"},
+        })
+
+        # The action call does not fit in the line: one argument per line
+        lines = role.tasks[-2].get_python()
+        self.assertEqual(lines, [
+            "self.add(",
+            "    builtin.apt(",
+            "        name=['vim', 'emacs', 'nano', 'joe', 'jed', 'mg', 'zile', 'ed', 'vis', 'kakoune', 'neovim'],",
+            "        state='present',",
+            "    ),",
+            "    name='Install a long list of packages',",
+            ")",
+        ])
+        compile("\n".join(lines), "test.py", "exec")
+
+        # The action call fits in a line of its own
+        lines = role.tasks[-1].get_python()
+        self.assertEqual(lines, [
+            "self.add(",
+            "    builtin.apt(name=['vim', 'emacs', 'nano', 'joe', 'jed', 'mg', 'zile', 'ed', 'vis'], state='present'),",
+            "    name='Install more packages',",
+            ")",
+        ])
+        compile("\n".join(lines), "test.py", "exec")
+
+    def test_role_vars(self):
+        loader = self.load()
+        self.assertEqual(loader.ansible_role.list_role_vars(), {"editor"})
+        loader.ansible_role.add_task({"name": "Touch", "file": {"path": "{{path}}", "state": "touch"}})
+        self.assertEqual(loader.ansible_role.list_role_vars(), {"editor", "path"})
+        self.assertEqual(loader.ansible_role.sorted_role_vars(), ("editor", "path"))
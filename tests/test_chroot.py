@@ -0,0 +1,142 @@
+from __future__ import annotations
+import unittest
+import tempfile
+import os
+from unittest import mock
+from transilience.chroot import Chroot, files_equal, COMPARE_BUFSIZE
+
+
+class TestChroot(unittest.TestCase):
+    def setUp(self):
+        super().setUp()
+        self.workdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.workdir.cleanup)
+        self.chroot = Chroot(os.path.join(self.workdir.name, "root"))
+        os.makedirs(self.chroot.root)
+
+    def make_src(self, relpath: str, contents: str) -> str:
+        """
+        Create a file outside the chroot, returning its path
+        """
+        path = os.path.join(self.workdir.name, "src", relpath)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wt") as fd:
+            fd.write(contents)
+        return path
+
+    def read(self, relpath: str) -> str:
+        with open(self.chroot.abspath(relpath), "rt") as fd:
+            return fd.read()
+
+    def test_copy_to_dir(self):
+        self.make_src("tree/subdir/file", "test")
+        src = os.path.join(self.workdir.name, "src", "tree")
+
+        # The parent of the destination does not exist yet
+        self.chroot.copy_to(src, "/opt/missing")
+        self.assertEqual(self.read("/opt/missing/tree/subdir/file"), "test")
+
+        # Copying again replaces the previous copy
+        self.make_src("tree/subdir/file", "changed")
+        self.chroot.copy_to(src, "/opt/missing")
+        self.assertEqual(self.read("/opt/missing/tree/subdir/file"), "changed")
+
+    def test_copy_to_dir_xattrs(self):
+        path = self.make_src("tree/file", "test")
+        try:
+            os.setxattr(path, "user.transilience", b"test")
+        except OSError:
+            raise unittest.SkipTest("extended attributes are not supported in the test directory")
+
+        self.chroot.copy_to(os.path.join(self.workdir.name, "src", "tree"), "/opt")
+        self.assertEqual(os.getxattr(self.chroot.abspath("/opt/tree/file"), "user.transilience"), b"test")
+
+    def test_write_file(self):
+        self.chroot.write_file("/etc/test/file", "test")
+        self.assertEqual(self.read("/etc/test/file"), "test")
+
+        # An existing file is replaced
+        self.chroot.write_file("/etc/test/file", "changed")
+        self.assertEqual(self.read("/etc/test/file"), "changed")
+
+        # A symlink is replaced, and its target is left untouched
+        self.chroot.write_file("/etc/test/target", "target")
+        os.symlink("target", self.chroot.abspath("/etc/test/link"))
+        self.chroot.write_file("/etc/test/link", "link")
+        self.assertFalse(os.path.islink(self.chroot.abspath("/etc/test/link")))
+        self.assertEqual(self.read("/etc/test/link"), "link")
+        self.assertEqual(self.read("/etc/test/target"), "target")
+
+        # No temporary files are left behind
+        self.assertEqual(sorted(os.listdir(self.chroot.abspath("/etc/test"))), ["file", "link", "target"])
+
+    def test_write_symlink(self):
+        self.chroot.write_symlink("/etc/test/link", "target")
+        path = self.chroot.abspath("/etc/test/link")
+        # The parent directory is created, and the link is not created as a
+        # directory
+        self.assertTrue(os.path.islink(path))
+        self.assertEqual(os.readlink(path), "target")
+
+        # An existing link is replaced
+        self.chroot.write_symlink("/etc/test/link", "other")
+        self.assertEqual(os.readlink(path), "other")
+
+    def test_copy_if_unchanged(self):
+        src = self.make_src("file", "test")
+        self.assertTrue(self.chroot.copy_if_unchanged(src, "/etc/test/file"))
+        self.assertEqual(self.read("/etc/test/file"), "test")
+        self.assertFalse(self.chroot.copy_if_unchanged(src, "/etc/test/file"))
+
+        # Same size, different contents
+        src = self.make_src("file", "tost")
+        self.assertTrue(self.chroot.copy_if_unchanged(src, "/etc/test/file"))
+        self.assertEqual(self.read("/etc/test/file"), "tost")
+
+        # Different size
+        src = self.make_src("file", "longer test")
+        self.assertTrue(self.chroot.copy_if_unchanged(src, "/etc/test/file"))
+        self.assertEqual(self.read("/etc/test/file"), "longer test")
+
+    def test_files_equal(self):
+        # Use contents that span more than one read buffer
+        size = COMPARE_BUFSIZE + 10
+        path1 = self.make_src("file1", "a" * size)
+        path2 = self.make_src("file2", "a" * size)
+        self.assertTrue(files_equal(path1, path2))
+
+        path2 = self.make_src("file2", "a" * (size - 1) + "b")
+        self.assertFalse(files_equal(path1, path2))
+
+        path2 = self.make_src("file2", "a" * (size - 1))
+        self.assertFalse(files_equal(path1, path2))
+
+        path1 = self.make_src("empty1", "")
+        path2 = self.make_src("empty2", "")
+        self.assertTrue(files_equal(path1, path2))
+
+    def test_file_contents_replace(self):
+        self.assertFalse(self.chroot.file_contents_replace("/missing", "foo", "bar"))
+
+        self.chroot.write_file("/empty", "")
+        self.assertFalse(self.chroot.file_contents_replace("/empty", "foo", "bar"))
+
+        self.chroot.write_file("/cmdline.txt", "console=tty1 init=/init_resize.sh quiet\n")
+        # Search string not found by the raw contents check
+        self.assertFalse(self.chroot.file_contents_replace("/cmdline.txt", "splash", ""))
+        self.assertEqual(self.read("/cmdline.txt"), "console=tty1 init=/init_resize.sh quiet\n")
+
+        self.assertTrue(self.chroot.file_contents_replace("/cmdline.txt", " init=/init_resize.sh", ""))
+        self.assertEqual(self.read("/cmdline.txt"), "console=tty1 quiet\n")
+
+        # Search strings with line endings skip the raw contents check
+        self.assertTrue(self.chroot.file_contents_replace("/cmdline.txt", "quiet\n", "quiet splash\n"))
+        self.assertEqual(self.read("/cmdline.txt"), "console=tty1 quiet splash\n")
+
+    def test_file_contents_replace_unencodable(self):
+        self.chroot.write_file("/test.txt", "test\n")
+        # A search string that cannot be encoded with the locale encoding
+        # falls back to the text comparison
+        with mock.patch("locale.getpreferredencoding", return_value="ascii"):
+            self.assertFalse(self.chroot.file_contents_replace("/test.txt", "♥", "love"))
+        self.assertEqual(self.read("/test.txt"), "test\n")
@@ -1,5 +1,7 @@
 from __future__ import annotations
 from unittest import TestCase
+import weakref
+import gc
 from transilience.ansible.conditionals import Conditional
 from transilience import template
 
@@ -69,3 +71,17 @@ class TestConditionals(TestCase):
         self.assertFalse(c.evaluate({"varname": 0}))
         self.assertTrue(c.evaluate({"varname": True}))
         self.assertEqual(c.get_python_code(), "(self.varname is not None and self.varname)")
+
+    def test_cache(self):
+        c1 = Conditional(self.engine, "varname is defined")
+        c2 = Conditional(self.engine, "varname is defined")
+        self.assertIs(c1.expression, c2.expression)
+        self.assertIs(c1.jinja2_ast, c2.jinja2_ast)
+
+        # The cache goes away with the template engine
+        engine = template.EngineFilesystem()
+        Conditional(engine, "varname is defined")
+        env = weakref.ref(engine.env)
+        del engine
+        gc.collect()
+        self.assertIsNone(env())
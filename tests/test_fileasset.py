@@ -31,6 +31,13 @@ class TestFileAssets(unittest.TestCase):
             self.assertEqual(a1.cached, a.cached)
             self.assertEqual(a1.path, a.path)
 
+    def test_local_empty(self):
+        with tempfile.NamedTemporaryFile("w+b") as tf:
+            a = LocalFileAsset(tf.name)
+            self.assertEqual(a.sha1sum(), "da39a3ee5e6b4b0d3255bfef95601890afd80709")
+            self.assertEqual(a.cached, b"")
+            self.assertRead(a, b"")
+
     def test_local_big(self):
         with tempfile.NamedTemporaryFile("w+b") as tf:
             # One megabyte file asset
@@ -52,6 +59,7 @@ class TestFileAssets(unittest.TestCase):
                 zf.writestr("dir/testfile", test_content)
 
             a = ZipFileAsset(tf.name, "dir/testfile")
+            self.addCleanup(FileAsset.close_caches)
             self.assertEqual(a.sha1sum(), "e5a07c60318532612d09da40e729bccf71018ed7")
             self.assertEqual(a.cached, test_content)
             self.assertRead(a, test_content)
@@ -66,6 +74,7 @@ class TestFileAssets(unittest.TestCase):
                 zf.writestr("dir/testfile", bytes(1024*1024))
 
             a = ZipFileAsset(tf.name, "dir/testfile")
+            self.addCleanup(FileAsset.close_caches)
             self.assertEqual(a.sha1sum(), "3b71f43ff30f4b15b5cd85dd9e95ebc7e84eb5a3")
             self.assertIsNone(a.cached)
             self.assertRead(a, bytes(1024*1024))
@@ -73,3 +82,30 @@ class TestFileAssets(unittest.TestCase):
             a1 = FileAsset.deserialize(a.serialize())
             self.assertEqual(a1.cached, a.cached)
             self.assertEqual(a1.path, a.path)
+
+    def test_zip_reuse(self):
+        with tempfile.NamedTemporaryFile("w+b") as tf:
+            with zipfile.ZipFile(tf, mode='w') as zf:
+                zf.writestr("dir/file1", b"file1")
+                zf.writestr("dir/file2", b"file2")
+            self.addCleanup(FileAsset.close_caches)
+
+            a1 = ZipFileAsset(tf.name, "dir/file1")
+            a2 = ZipFileAsset(tf.name, "dir/file2")
+            # Members of the same archive can be open at the same time
+            with a1.open() as fd1:
+                with a2.open() as fd2:
+                    self.assertEqual(fd1.read(), b"file1")
+                    self.assertEqual(fd2.read(), b"file2")
+
+            # The archive is reopened if it changes
+            tf.seek(0)
+            tf.truncate()
+            with zipfile.ZipFile(tf, mode='w') as zf:
+                zf.writestr("dir/file1", b"changed file1")
+            tf.flush()
+            self.assertRead(a1, b"changed file1")
+
+    def test_compute_file_sha1sum(self):
+        with io.BytesIO("test content ♥".encode()) as fd:
+            self.assertEqual(FileAsset.compute_file_sha1sum(fd), "e5a07c60318532612d09da40e729bccf71018ed7")
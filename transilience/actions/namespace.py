@@ -1,5 +1,5 @@
 from __future__ import annotations
-from typing import TYPE_CHECKING, Optional, Callable
+from typing import TYPE_CHECKING, Optional, Dict, Type
 
 if TYPE_CHECKING:
     from .action import Action
@@ -12,6 +12,8 @@ class Namespace:
 
     def __init__(self, name: str):
         self.name = name
+        # Registered actions, indexed by name
+        self.actions: Dict[str, Type[Action]] = {}
 
     def __str__(self):
         return self.name
@@ -21,19 +23,21 @@ class Namespace:
 
     def action(
             self,
-            factory: Optional[Callable[..., Action]] = None,
+            factory: Optional[Type[Action]] = None,
             *,
             name=None):
         if factory is None:
-            def decorator(factory: Callable[..., Action]):
+            def decorator(factory: Type[Action]):
                 nonlocal name
                 if name is None:
                     name = factory.__name__
+                self.actions[name] = factory
                 setattr(self, name, factory)
                 return factory
             return decorator
         else:
             name = factory.__name__
+            self.actions[name] = factory
             setattr(self, name, factory)
             return factory
 
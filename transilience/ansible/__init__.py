@@ -1,8 +1,8 @@
 from __future__ import annotations
-from typing import TYPE_CHECKING, Type, Dict, Any
+from typing import TYPE_CHECKING, Type, Dict, Any, Optional, Callable, IO
 import zipfile
+import io
 import os
-import yaml
 from .exceptions import RoleNotFoundError
 from .role import AnsibleRoleFilesystem, AnsibleRoleZip
 
@@ -32,6 +32,59 @@ if TYPE_CHECKING:
 #     - or
 
 
+# Marker for values that have not been computed yet
+_UNSET: Any = object()
+
+# Function used to reformat generated code, looked up on first use. None
+# means that no formatter is installed
+_format_code: Optional[Callable[[str], str]] = _UNSET
+
+
+def _get_format_code() -> Optional[Callable[[str], str]]:
+    """
+    Return a function that reformats Python code, or None if neither black
+    nor yapf are available.
+
+    black is preferred, as it is considerably faster. The formatter is looked
+    up only once, the first time this function is called
+    """
+    global _format_code
+    if _format_code is not _UNSET:
+        return _format_code
+
+    try:
+        import black  # type: ignore
+    except ModuleNotFoundError:
+        pass
+    else:
+        def format_black(code: str) -> str:
+            return black.format_str(code, mode=black.Mode(line_length=120))
+        _format_code = format_black
+        return _format_code
+
+    try:
+        from yapf.yapflib import yapf_api  # type: ignore
+    except ModuleNotFoundError:
+        _format_code = None
+    else:
+        def format_yapf(code: str) -> str:
+            code, changed = yapf_api.FormatCode(code)
+            return code
+        _format_code = format_yapf
+    return _format_code
+
+
+def _load_yaml(fd: IO) -> Any:
+    """
+    Parse YAML from a file object, using libyaml if available.
+
+    yaml is imported on first use, so that importing this module to run
+    already generated roles does not need it
+    """
+    import yaml
+    return yaml.load(fd, Loader=getattr(yaml, "CSafeLoader", yaml.SafeLoader))
+
+
 class RoleLoader:
     def __init__(self, name: str):
         self.name = name
@@ -42,9 +95,7 @@ class RoleLoader:
 
     def load_parsed_handlers(self, handlers: YamlDict):
         for info in handlers:
-            h = self.ansible_role.create_handler_role(info["name"])
-            h.add_task(info)
-            self.ansible_role.handlers[info["name"]] = h
+            self.ansible_role.add_handler(info)
 
     def load(self):
         self.load_handlers()
@@ -53,16 +104,25 @@ class RoleLoader:
     def get_role_class(self) -> Type[Role]:
         return self.ansible_role.get_role_class()
 
-    def get_python_code(self) -> str:
-        lines = self.ansible_role.get_python_code_module()
+    def get_python_code(self, pretty: bool = False) -> str:
+        """
+        Return the Python code for this role.
 
-        code = "\n".join(lines)
-        try:
-            from yapf.yapflib import yapf_api
-        except ModuleNotFoundError:
+        The generated code is already laid out to be readable. If pretty is
+        True and black or yapf are available, it is also reformatted with
+        them.
+        """
+        out = io.StringIO()
+        self.ansible_role.write_python_code_module(out)
+
+        code = out.getvalue()
+        if not pretty:
+            return code
+
+        format_code = _get_format_code()
+        if format_code is None:
             return code
-        code, changed = yapf_api.FormatCode(code)
-        return code
+        return format_code(code)
 
 
 class FilesystemRoleLoader(RoleLoader):
@@ -76,7 +136,7 @@ class FilesystemRoleLoader(RoleLoader):
 
         try:
             with open(tasks_file, "rt") as fd:
-                tasks = yaml.load(fd, Loader=yaml.CLoader)
+                tasks = _load_yaml(fd)
         except FileNotFoundError:
             raise RoleNotFoundError(self.name)
 
@@ -87,7 +147,7 @@ class FilesystemRoleLoader(RoleLoader):
 
         try:
             with open(handlers_file, "rt") as fd:
-                handlers = yaml.load(fd, Loader=yaml.CLoader)
+                handlers = _load_yaml(fd)
         except FileNotFoundError:
             return
 
@@ -109,9 +169,11 @@ class ZipRoleLoader(RoleLoader):
         self.ansible_role = AnsibleRoleZip(name=name, archive=self.zipfile, root=os.path.join("roles", self.name))
 
     def load_tasks(self):
+        # libyaml reads from the zip member as it parses, without first
+        # decompressing the whole file in memory
         try:
             with self.zipfile.open(os.path.join("roles", self.name, "tasks", "main.yaml"), "r") as fd:
-                tasks = yaml.load(fd, Loader=yaml.CLoader)
+                tasks = _load_yaml(fd)
         except KeyError:
             raise RoleNotFoundError(self.name)
 
@@ -120,7 +182,7 @@ class ZipRoleLoader(RoleLoader):
     def load_handlers(self):
         try:
             with self.zipfile.open(os.path.join("roles", self.name, "handlers", "main.yaml"), "r") as fd:
-                handlers = yaml.load(fd, Loader=yaml.CLoader)
+                handlers = _load_yaml(fd)
         except KeyError:
             return
 
@@ -1,65 +1,94 @@
 from __future__ import annotations
-from typing import TYPE_CHECKING, Sequence, Callable, Dict, Any, Set
+from typing import TYPE_CHECKING, Sequence, Callable, Dict, Any, Set, Tuple, Type
 import jinja2.parser
 import jinja2.meta
-import jinja2.visitor
 from jinja2 import nodes
 
 if TYPE_CHECKING:
+    import jinja2
     from .. import template
 
 
-class FindVars(jinja2.visitor.NodeVisitor):
-    def __init__(self):
-        self.found: Set[str] = set()
+def compile_expression(engine: template.Engine, body: str) -> Tuple[Callable, nodes.Node]:
+    """
+    Compile a Jinja2 expression to a callable, and parse it into an AST.
 
-    def visit_Name(self, node):
-        if node.ctx == "load":
-            self.found.add(node.name)
+    Results are cached in the template engine, since the same conditionals
+    tend to be repeated across tasks
+    """
+    res = engine.expressions.get(body)
+    if res is None:
+        parser = jinja2.parser.Parser(engine.env, body, state='variable')
+        res = engine.expressions[body] = (engine.env.compile_expression(body), parser.parse_expression())
+    return res
 
 
-def to_python_code(node: nodes.Node) -> str:
-    if isinstance(node, nodes.Name):
-        if node.ctx == "load":
-            return f"self.{node.name}"
-        else:
-            raise NotImplementedError(f"jinja2 Name nodes with ctx={node.ctx!r} are not supported: {node!r}")
-    elif isinstance(node, nodes.Test):
-        if node.name == "defined":
-            return f"{to_python_code(node.node)} is not None"
-        elif node.name == "undefined":
-            return f"{to_python_code(node.node)} is None"
-        else:
-            raise NotImplementedError(f"jinja2 Test nodes with name={node.name!r} are not supported: {node!r}")
-    elif isinstance(node, nodes.Not):
-        if isinstance(node.node, nodes.Test):
-            # Special case match well-known structures for more idiomatic Python
-            if node.node.name == "defined":
-                return f"{to_python_code(node.node.node)} is None"
-            elif node.node.name == "undefined":
-                return f"{to_python_code(node.node.node)} is not None"
-        elif isinstance(node.node, nodes.Name):
-            return f"not {to_python_code(node.node)}"
-        return f"not ({to_python_code(node.node)})"
-    elif isinstance(node, nodes.Or):
-        return f"({to_python_code(node.left)} or {to_python_code(node.right)})"
-    elif isinstance(node, nodes.And):
-        return f"({to_python_code(node.left)} and {to_python_code(node.right)})"
+def _name_to_python_code(node: nodes.Name) -> str:
+    if node.ctx == "load":
+        return f"self.{node.name}"
+    else:
+        raise NotImplementedError(f"jinja2 Name nodes with ctx={node.ctx!r} are not supported: {node!r}")
+
+
+def _test_to_python_code(node: nodes.Test) -> str:
+    if node.name == "defined":
+        return f"{to_python_code(node.node)} is not None"
+    elif node.name == "undefined":
+        return f"{to_python_code(node.node)} is None"
     else:
+        raise NotImplementedError(f"jinja2 Test nodes with name={node.name!r} are not supported: {node!r}")
+
+
+def _not_to_python_code(node: nodes.Not) -> str:
+    if isinstance(node.node, nodes.Test):
+        # Special case match well-known structures for more idiomatic Python
+        if node.node.name == "defined":
+            return f"{to_python_code(node.node.node)} is None"
+        elif node.node.name == "undefined":
+            return f"{to_python_code(node.node.node)} is not None"
+    elif isinstance(node.node, nodes.Name):
+        return f"not {to_python_code(node.node)}"
+    return f"not ({to_python_code(node.node)})"
+
+
+def _or_to_python_code(node: nodes.Or) -> str:
+    return f"({to_python_code(node.left)} or {to_python_code(node.right)})"
+
+
+def _and_to_python_code(node: nodes.And) -> str:
+    return f"({to_python_code(node.left)} and {to_python_code(node.right)})"
+
+
+# Functions converting jinja2 AST nodes to Python code, indexed by node type
+_to_python_code_by_type: Dict[Type[nodes.Node], Callable[[Any], str]] = {
+    nodes.Name: _name_to_python_code,
+    nodes.Test: _test_to_python_code,
+    nodes.Not: _not_to_python_code,
+    nodes.Or: _or_to_python_code,
+    nodes.And: _and_to_python_code,
+}
+
+
+def to_python_code(node: nodes.Node) -> str:
+    convert = _to_python_code_by_type.get(type(node))
+    if convert is None:
         raise NotImplementedError(f"jinja2 {node.__class__} nodes are not supported: {node!r}")
+    return convert(node)
 
 
 class Conditional:
     """
     An Ansible conditional expression
     """
+    __slots__ = ("body", "expression", "jinja2_ast")
+
     def __init__(self, engine: template.Engine, body: str):
         # Original unparsed expression
         self.body: str = body
-        # Expression compiled to a callable
-        self.expression: Callable = engine.env.compile_expression(body)
-        parser = jinja2.parser.Parser(engine.env, body, state='variable')
-        self.jinja2_ast: nodes.Node = parser.parse_expression()
+        # Expression compiled to a callable, and its parsed AST
+        self.expression: Callable
+        self.jinja2_ast: nodes.Node
+        self.expression, self.jinja2_ast = compile_expression(engine, body)
 
     def to_jsonable(self) -> Dict[str, Any]:
         return {
@@ -68,9 +97,14 @@ class Conditional:
         }
 
     def list_role_vars(self) -> Sequence[str]:
-        fv = FindVars()
-        fv.visit(self.jinja2_ast)
-        return fv.found
+        found: Set[str] = set()
+        # find_all only looks at child nodes, so check the root node separately
+        if isinstance(self.jinja2_ast, nodes.Name) and self.jinja2_ast.ctx == "load":
+            found.add(self.jinja2_ast.name)
+        for node in self.jinja2_ast.find_all(nodes.Name):
+            if node.ctx == "load":
+                found.add(node.name)
+        return found
 
     def evaluate(self, ctx: Dict[str, Any]):
         ctx = {name: val for name, val in ctx.items() if val is not None}
@@ -1,5 +1,6 @@
 from __future__ import annotations
-from typing import TYPE_CHECKING, Any, Optional, List, Dict, Sequence
+from typing import TYPE_CHECKING, Any, Optional, List, Dict, Sequence, Tuple, Callable, Type
+import functools
 import os
 import re
 
@@ -8,80 +9,72 @@ if TYPE_CHECKING:
     from ..role import Role
 
 
-re_template_start = re.compile(r"{{|{%|{#")
-re_single_var = re.compile(r"^{{\s*(\w*)\s*}}$")
+# Match a Jinja2 template that is only a reference to a single variable
+re_single_var = re.compile(r"{{\s*(\w+)\s*}}\Z")
+
+
+def _get_role_var(role: Role, name: str) -> Any:
+    """
+    Return the value of a role variable.
+
+    Role variables are dataclass fields, and are set in the instance dict:
+    look them up there first, skipping the class attribute lookup
+    """
+    try:
+        return role.__dict__[name]
+    except KeyError:
+        return getattr(role, name)
 
 
 class Parameter:
+    __slots__ = ()
+
+    # True if the value of this parameter does not depend on the role, and
+    # can be shared by all the actions created from it. Lists and dicts are
+    # never constant, since actions can modify their fields
+    constant = False
+
     def list_role_vars(self, role: Role) -> Sequence[str]:
         """
         List the name of template variables used by this parameter
         """
         return ()
 
+    def get_value(self, role: Role) -> Any:
+        """
+        Return the value of this parameter for the given role.
+
+        Constant parameters do not use role
+        """
+        raise NotImplementedError(f"{self.__class__}.get_value is not implemented")
+
     @classmethod
-    def create(cls, f: Optional[Field], value: Any):
-        if isinstance(value, str):
-            # Hook for templated strings
-            #
-            # For reference, Jinja2 template detection in Ansible is in
-            # template/__init__.py look for Templar.is_possibly_template,
-            # Templar.is_template, and is_template
-            if re_template_start.search(value):
-                mo = re_single_var.match(value)
-                if f is not None and f.metadata.get("type") == "local_file":
-                    if mo:
-                        return ParameterVarFileReference(value)
-                    else:
-                        return ParameterTemplatedFileReference(value)
-                elif f is not None and f.type == "List[str]":
-                    if mo:
-                        return ParameterVarReferenceStringList(mo.group(1))
-                    else:
-                        return ParameterTemplatedStringList(value)
-                else:
-                    if mo:
-                        return ParameterVarReference(mo.group(1))
-                    else:
-                        return ParameterTemplateString(value)
-            elif f is not None and f.metadata.get("type") == "local_file":
-                return ParameterFileReference(value)
-            elif f is not None and f.type == "List[str]":
-                return ParameterAny(value.split(','))
-            else:
-                return ParameterAny(value)
-        elif isinstance(value, int):
-            if f.metadata.get("octal"):
-                return ParameterOctal(value)
-            else:
-                return ParameterAny(value)
-        elif isinstance(value, list):
-            elements = []
-            for val in value:
-                elements.append(cls.create(None, val))
-            return ParameterList(elements)
-        elif isinstance(value, dict):
-            elements = {}
-            for name, val in value.items():
-                elements[name] = cls.create(None, val)
-            return ParameterDict(elements)
-        else:
-            return ParameterAny(value)
+    def create(cls, f: Optional[Field], value: Any) -> "Parameter":
+        """
+        Create a Parameter for the given value of the given action field.
+
+        f is None for values nested inside lists or dicts
+        """
+        return _create_by_type.get(type(value), _create_any)(f, value)
 
 
 class ParameterList(Parameter):
+    __slots__ = ("parameters",)
+
     def __init__(self, parameters: List[Parameter]):
         self.parameters = parameters
 
     def list_role_vars(self, role: Role) -> Sequence[str]:
+        res: List[str] = []
         for p in self.parameters:
-            yield from p.list_role_vars(role)
+            res.extend(p.list_role_vars(role))
+        return res
 
     def get_value(self, role: Role):
         return [p.get_value(role) for p in self.parameters]
 
     def __repr__(self):
-        return f"[{', '.join(repr(p) for p in self.parameters)}]"
+        return f"[{', '.join([repr(p) for p in self.parameters])}]"
 
     def to_jsonable(self) -> Dict[str, Any]:
         return {
@@ -92,31 +85,36 @@ class ParameterList(Parameter):
 
 
 class ParameterDict(Parameter):
+    __slots__ = ("parameters",)
+
     def __init__(self, parameters: Dict[str, Parameter]):
         self.parameters = parameters
 
     def list_role_vars(self, role: Role) -> Sequence[str]:
+        res: List[str] = []
         for p in self.parameters.values():
-            yield from p.list_role_vars(role)
+            res.extend(p.list_role_vars(role))
+        return res
 
     def get_value(self, role: Role):
         return {name: p.get_value(role) for name, p in self.parameters.items()}
 
     def __repr__(self):
-        parts = []
-        for name, p in self.parameters.items():
-            parts.append(f"{name!r}: {p!r}")
-        return "{" + ', '.join(parts) + "}"
+        return "{" + ', '.join([f"{name!r}: {p!r}" for name, p in self.parameters.items()]) + "}"
 
     def to_jsonable(self) -> Dict[str, Any]:
         return {
             "node": "parameter",
             "type": "dict",
-            "value": [{name, p.to_jsonable()} for name, p in self.parameters.items()],
+            "value": {name: p.to_jsonable() for name, p in self.parameters.items()},
         }
 
 
 class ParameterAny(Parameter):
+    __slots__ = ("value",)
+
+    constant = True
+
     def __init__(self, value: Any):
         self.value = value
 
@@ -135,6 +133,8 @@ class ParameterAny(Parameter):
 
 
 class ParameterOctal(ParameterAny):
+    __slots__ = ()
+
     def __repr__(self):
         if isinstance(self.value, int):
             return f"0o{self.value:o}"
@@ -145,11 +145,29 @@ class ParameterOctal(ParameterAny):
         return {
             "node": "parameter",
             "type": "octal",
-            "value": "0o{self.value:o}" if isinstance(self.value, int) else self.value
+            "value": f"0o{self.value:o}" if isinstance(self.value, int) else self.value
         }
 
 
+class ParameterStringList(ParameterAny):
+    """
+    List of strings given as a comma-separated string
+    """
+    __slots__ = ()
+
+    # Parameters are shared between tasks: give each action its own copy of
+    # the list, since actions can modify their fields
+    constant = False
+
+    def get_value(self, role: Role):
+        return list(self.value)
+
+
 class ParameterTemplatedStringList(ParameterAny):
+    __slots__ = ()
+
+    constant = False
+
     def list_role_vars(self, role: Role) -> Sequence[str]:
         return role.template_engine.list_string_template_vars(self.value)
 
@@ -168,14 +186,18 @@ class ParameterTemplatedStringList(ParameterAny):
 
 
 class ParameterVarReferenceStringList(ParameterAny):
+    __slots__ = ()
+
+    constant = False
+
     def list_role_vars(self, role: Role) -> Sequence[str]:
-        yield self.value
+        return (self.value,)
 
     def __repr__(self):
         return f"self.{self.value}.split(',')"
 
     def get_value(self, role: Role):
-        return getattr(role, self.value).split(',')
+        return _get_role_var(role, self.value).split(',')
 
     def to_jsonable(self) -> Dict[str, Any]:
         return {
@@ -186,16 +208,23 @@ class ParameterVarReferenceStringList(ParameterAny):
 
 
 class ParameterTemplatePath(ParameterAny):
+    __slots__ = ("path",)
+
+    constant = False
+
+    def __init__(self, value: str):
+        super().__init__(value)
+        # Path of the template relative to the role
+        self.path = os.path.join("templates", value)
+
     def list_role_vars(self, role: Role) -> Sequence[str]:
-        yield from role.template_engine.list_file_template_vars(os.path.join("templates", self.value))
+        return role.template_engine.list_file_template_vars(self.path)
 
     def __repr__(self):
-        path = os.path.join("templates", self.value)
-        return f"self.render_file({path!r})"
+        return f"self.render_file({self.path!r})"
 
     def get_value(self, role: Role):
-        path = os.path.join("templates", self.value)
-        return role.render_file(path)
+        return role.render_file(self.path)
 
     def to_jsonable(self) -> Dict[str, Any]:
         return {
@@ -206,14 +235,18 @@ class ParameterTemplatePath(ParameterAny):
 
 
 class ParameterVarReference(ParameterAny):
+    __slots__ = ()
+
+    constant = False
+
     def list_role_vars(self, role: Role) -> Sequence[str]:
-        yield self.value
+        return (self.value,)
 
     def __repr__(self):
         return f"self.{self.value}"
 
     def get_value(self, role: Role):
-        return getattr(role, self.value)
+        return _get_role_var(role, self.value)
 
     def to_jsonable(self) -> Dict[str, Any]:
         return {
@@ -224,6 +257,10 @@ class ParameterVarReference(ParameterAny):
 
 
 class ParameterTemplateString(ParameterAny):
+    __slots__ = ()
+
+    constant = False
+
     def list_role_vars(self, role: Role) -> Sequence[str]:
         return role.template_engine.list_string_template_vars(self.value)
 
@@ -242,14 +279,18 @@ class ParameterTemplateString(ParameterAny):
 
 
 class ParameterVarFileReference(ParameterAny):
+    __slots__ = ()
+
+    constant = False
+
     def list_role_vars(self, role: Role) -> Sequence[str]:
-        yield self.value
+        return (self.value,)
 
     def __repr__(self):
         return f"self.lookup_file(os.path.join('files', self.{self.value}))"
 
     def get_value(self, role: Role):
-        return role.lookup_file(os.path.join("files", getattr(role, self.value)))
+        return role.lookup_file(os.path.join("files", _get_role_var(role, self.value)))
 
     def to_jsonable(self) -> Dict[str, Any]:
         return {
@@ -260,6 +301,10 @@ class ParameterVarFileReference(ParameterAny):
 
 
 class ParameterTemplatedFileReference(ParameterAny):
+    __slots__ = ()
+
+    constant = False
+
     def list_role_vars(self, role: Role) -> Sequence[str]:
         return role.template_engine.list_string_template_vars(self.value)
 
@@ -278,11 +323,20 @@ class ParameterTemplatedFileReference(ParameterAny):
 
 
 class ParameterFileReference(ParameterAny):
+    __slots__ = ("path",)
+
+    constant = False
+
+    def __init__(self, value: str):
+        super().__init__(value)
+        # Path of the file relative to the role
+        self.path = os.path.join("files", value)
+
     def __repr__(self):
         return f"self.lookup_file(os.path.join('files', {self.value!r}))"
 
     def get_value(self, role: Role):
-        return role.lookup_file(os.path.join("files", self.value))
+        return role.lookup_file(self.path)
 
     def to_jsonable(self) -> Dict[str, Any]:
         return {
@@ -290,3 +344,113 @@ class ParameterFileReference(ParameterAny):
             "type": "file_reference",
             "value": self.value
         }
+
+
+@functools.lru_cache(maxsize=4096)
+def classify_string(value: str) -> Tuple[bool, Optional[str]]:
+    """
+    Check if a string is a Jinja2 template.
+
+    Return a tuple (is_template, name), where name is the variable name if the
+    template is only a reference to one variable, or None otherwise.
+
+    Results are cached, since the same strings tend to be repeated across
+    tasks
+    """
+    # For reference, Jinja2 template detection in Ansible is in
+    # template/__init__.py look for Templar.is_possibly_template,
+    # Templar.is_template, and is_template
+    #
+    # Most strings contain no braces at all, so that is checked first
+    if "{" not in value:
+        return False, None
+    if "{{" not in value and "{%" not in value and "{#" not in value:
+        return False, None
+    # Only try matching a single variable reference if the string could be
+    # one
+    if not value.startswith("{{") or not value.endswith("}}"):
+        return True, None
+    mo = re_single_var.match(value)
+    if mo is None:
+        return True, None
+    return True, mo.group(1)
+
+
+@functools.lru_cache(maxsize=None)
+def _create_var_reference(cls: Type[ParameterAny], name: str) -> Parameter:
+    """
+    Return the parameter of the given class referencing the role variable
+    with the given name.
+
+    There is one instance per class and variable name, shared by all tasks
+    """
+    return cls(name)
+
+
+# Parameters created from scalar values are immutable, and the same values
+# tend to be repeated across tasks (like paths, modes, owners), so they are
+# shared. Dispatch is by exact type, so each of these caches only sees values
+# of one type, and True and 1 cannot be mixed up
+@functools.lru_cache(maxsize=4096)
+def _create_str(f: Optional[Field], value: str) -> Parameter:
+    # Hook for templated strings
+    is_template, var_name = classify_string(value)
+
+    if f is None:
+        is_local_file = is_str_list = False
+    else:
+        is_local_file = f.metadata.get("type") == "local_file"
+        is_str_list = f.type == "List[str]"
+
+    if is_template:
+        if is_local_file:
+            if var_name is not None:
+                return _create_var_reference(ParameterVarFileReference, var_name)
+            else:
+                return ParameterTemplatedFileReference(value)
+        elif is_str_list:
+            if var_name is not None:
+                return _create_var_reference(ParameterVarReferenceStringList, var_name)
+            else:
+                return ParameterTemplatedStringList(value)
+        else:
+            if var_name is not None:
+                return _create_var_reference(ParameterVarReference, var_name)
+            else:
+                return ParameterTemplateString(value)
+    elif is_local_file:
+        return ParameterFileReference(value)
+    elif is_str_list:
+        return ParameterStringList(value.split(','))
+    else:
+        return ParameterAny(value)
+
+
+@functools.lru_cache(maxsize=4096)
+def _create_int(f: Optional[Field], value: int) -> Parameter:
+    if f is not None and f.metadata.get("octal"):
+        return ParameterOctal(value)
+    else:
+        return ParameterAny(value)
+
+
+def _create_any(f: Optional[Field], value: Any) -> Parameter:
+    return ParameterAny(value)
+
+
+def _create_list(f: Optional[Field], value: List[Any]) -> Parameter:
+    return ParameterList([Parameter.create(None, val) for val in value])
+
+
+def _create_dict(f: Optional[Field], value: Dict[str, Any]) -> Parameter:
+    return ParameterDict({name: Parameter.create(None, val) for name, val in value.items()})
+
+
+# Functions used by Parameter.create, indexed by the type of the value. Values
+# of other types are handled by _create_any
+_create_by_type: Dict[type, Callable[[Optional[Field], Any], Parameter]] = {
+    str: _create_str,
+    int: _create_int,
+    list: _create_list,
+    dict: _create_dict,
+}
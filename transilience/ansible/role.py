@@ -1,6 +1,6 @@
 from __future__ import annotations
-from typing import TYPE_CHECKING, Type, Dict, Any, List, Optional, Set, Sequence
-from dataclasses import fields, field, make_dataclass
+from typing import TYPE_CHECKING, Type, Dict, Any, List, Optional, FrozenSet, TextIO, Tuple
+from dataclasses import dataclass, fields, field
 import zipfile
 import shlex
 import re
@@ -14,48 +14,92 @@ from .exceptions import RoleNotLoadedError
 if TYPE_CHECKING:
     YamlDict = Dict[str, Any]
 
+# Prefix of fully qualified names of Ansible builtin modules
+ANSIBLE_BUILTIN_PREFIX = "ansible.builtin."
+
+# Task keys that are not the name of the module to run
+TASK_KEYWORDS = frozenset(("name", "args", "notify", "when"))
+
+# Translation table turning all ASCII characters that are not letters into
+# spaces, used to build Python names out of role names
+python_name_table = {c: " " for c in range(128) if not chr(c).isalpha()}
+
+# Match sequences of characters that are not ASCII letters, used to build
+# Python names out of non-ASCII role names
+re_python_name_separator = re.compile(r"[^A-Za-z]+")
+
+# Names of the Platform facts, which are not role variables even if they are
+# used by templates
+platform_fact_names = frozenset(f.name for f in fields(facts.Platform))
+
 
 class AnsibleRole:
+    __slots__ = ("name", "uses_facts", "tasks", "handlers", "template_engine", "_role_cls", "_python_name",
+                 "_role_vars", "_sorted_role_vars")
+
     def __init__(self, name: str, uses_facts: bool = True):
         self.name = name
         self.uses_facts = uses_facts
         self.tasks: List[Task] = []
         self.handlers: Dict[str, "AnsibleRole"] = {}
         self.template_engine: template.Engine
+        # Role class built by get_role_class, reset when tasks or handlers
+        # are added
+        self._role_cls: Optional[Type[Role]] = None
+        # Cached result of get_python_name
+        self._python_name: Optional[str] = None
+        # Cached result of list_role_vars, reset when tasks are added
+        self._role_vars: Optional[FrozenSet[str]] = None
+        # Cached result of sorted_role_vars, reset when tasks are added
+        self._sorted_role_vars: Optional[Tuple[str, ...]] = None
+
+    def create_handler_role(self, name: str) -> "AnsibleRole":
+        """
+        Create the role used to run the handler with the given name
+        """
+        raise NotImplementedError(f"{self.__class__}.create_handler_role is not implemented")
+
+    def add_handler(self, task_info: YamlDict):
+        """
+        Add a handler, as a role with the given task
+        """
+        h = self.create_handler_role(task_info["name"])
+        h.add_task(task_info)
+        self.handlers[task_info["name"]] = h
+        self._role_cls = None
 
     def add_task(self, task_info: YamlDict):
-        candidates = []
-
-        for key in task_info.keys():
-            if key in ("name", "args", "notify", "when"):
+        # Find the only key that is not a task keyword
+        modname = None
+        for key in task_info:
+            if key in TASK_KEYWORDS:
                 continue
-            candidates.append(key)
-
-        if len(candidates) != 1:
+            if modname is not None:
+                raise RoleNotLoadedError(f"could not find a known module in task {task_info!r}")
+            modname = key
+        if modname is None:
             raise RoleNotLoadedError(f"could not find a known module in task {task_info!r}")
-
-        modname = candidates[0]
-        if modname.startswith("ansible.builtin."):
-            name = modname[16:]
+        if modname.startswith(ANSIBLE_BUILTIN_PREFIX):
+            name = modname[len(ANSIBLE_BUILTIN_PREFIX):]
         else:
             name = modname
 
+        modargs = task_info[modname]
         args: YamlDict
-        if isinstance(task_info[name], dict):
-            args = task_info[name]
-        else:
-            args = task_info.get("args", {})
+        if isinstance(modargs, dict):
+            args = modargs
+        elif name == "command":
             # Fixups for command: in Ansible it can be a simple string instead
-            # of a dict
-            if name == "command":
-                args["argv"] = shlex.split(task_info[name])
-            else:
-                raise RoleNotLoadedError(f"ansible module argument for {modname} is not a dict")
+            # of a dict. Merge into a new dict, to leave task_info["args"]
+            # untouched
+            args = {**task_info.get("args", {}), "argv": shlex.split(modargs)}
+        else:
+            raise RoleNotLoadedError(f"ansible module argument for {modname} is not a dict")
 
         if name == "template":
             task = TaskTemplate(args, task_info)
         else:
-            action_cls = getattr(builtin, name, None)
+            action_cls = builtin.actions.get(name)
             if action_cls is None:
                 raise RoleNotLoadedError(f"Action builtin.{name} not available in Transilience")
 
@@ -63,23 +107,26 @@ class AnsibleRole:
 
             task = Task(action_cls, args, task_info, transilience_name)
 
+        # Normalize notify and when into lists, once: the rest of the code
+        # works on Task.notify and Task.conditionals
         notify = task_info.get("notify")
         if notify is not None:
             if isinstance(notify, str):
-                notify = [notify]
-            for name in notify:
-                h = self.handlers[name]
-                task.notify.append(h)
+                task.notify.append(self.handlers[notify])
+            else:
+                task.notify.extend([self.handlers[name] for name in notify])
 
         when = task_info.get("when")
         if when is not None:
-            if not isinstance(when, list):
-                when = [when]
-            for expr in when:
-                cond = Conditional(self.template_engine, expr)
-                task.conditionals.append(cond)
+            if isinstance(when, list):
+                task.conditionals.extend([Conditional(self.template_engine, expr) for expr in when])
+            else:
+                task.conditionals.append(Conditional(self.template_engine, when))
 
         self.tasks.append(task)
+        self._role_cls = None
+        self._role_vars = None
+        self._sorted_role_vars = None
 
     def to_jsonable(self) -> Dict[str, Any]:
         return {
@@ -91,29 +138,34 @@ class AnsibleRole:
             "handlers": [h.to_jsonable() for h in self.handlers.values()],
         }
 
-    def list_role_vars(self) -> Sequence[str]:
-        role_vars: Set[str] = set()
-        for task in self.tasks:
-            role_vars.update(task.list_role_vars(self))
-        role_vars -= {f.name for f in fields(facts.Platform)}
-        return role_vars
+    def list_role_vars(self) -> FrozenSet[str]:
+        if self._role_vars is None:
+            role_vars = frozenset().union(*(task.list_role_vars(self) for task in self.tasks))
+            self._role_vars = role_vars - platform_fact_names
+        return self._role_vars
+
+    def sorted_role_vars(self) -> Tuple[str, ...]:
+        """
+        Return the names of the role variables, sorted
+        """
+        if self._sorted_role_vars is None:
+            self._sorted_role_vars = tuple(sorted(self.list_role_vars()))
+        return self._sorted_role_vars
 
     def get_role_class_fields(self):
-        fields = []
-        for name in sorted(self.list_role_vars()):
-            fields.append((name, Any, field(default=None)))
-        return fields
+        return [(name, Any, field(default=None)) for name in self.sorted_role_vars()]
 
     def get_role_class_namespace(self):
-        # If we have handlers, instantiate role classes for them
-        handler_classes = {}
-        for name, role_builder in self.handlers.items():
-            handler_classes[name] = role_builder.get_role_class()
+        # Build role classes only for the handlers that are notified by
+        # some task
+        handler_classes: Dict[str, Type[Role]] = {}
+        for task in self.tasks:
+            for handler in task.notify:
+                if handler.name not in handler_classes:
+                    handler_classes[handler.name] = handler.get_role_class()
 
         # Create all the functions to start actions in the role
-        start_funcs = []
-        for role_action in self.tasks:
-            start_funcs.append(role_action.get_start_func(handlers=handler_classes))
+        start_funcs = tuple(task.get_start_func(handlers=handler_classes) for task in self.tasks)
 
         # Function that calls all the 'Action start' functions
         def role_main(self):
@@ -129,89 +181,131 @@ class AnsibleRole:
         return namespace
 
     def get_role_class(self) -> Type[Role]:
-        fields = self.get_role_class_fields()
+        if self._role_cls is not None:
+            return self._role_cls
+
+        # Build the class body directly instead of using make_dataclass, so
+        # that the dataclass machinery runs only once: with_facts already
+        # turns the class into a dataclass before adding the facts fields
         namespace = self.get_role_class_namespace()
+        annotations = {}
+        for name, type_, default in self.get_role_class_fields():
+            annotations[name] = type_
+            namespace[name] = default
+        namespace["__annotations__"] = annotations
+        role_cls = type(self.name, (Role,), namespace)
         if self.uses_facts:
-            role_cls = make_dataclass(self.name, fields, bases=(Role,), namespace=namespace)
             role_cls = with_facts(facts.Platform)(role_cls)
         else:
-            role_cls = make_dataclass(self.name, fields, bases=(Role,), namespace=namespace)
+            role_cls = dataclass(role_cls)
 
+        self._role_cls = role_cls
         return role_cls
 
-    def get_python_code_module(self) -> List[str]:
-        lines = [
-            "from __future__ import annotations",
-            "from typing import Any",
-            "import os",
-            "from transilience import role",
-            "from transilience.actions import builtin, facts",
-            "",
-        ]
-
+    def write_python_code_module(self, out: TextIO):
+        """
+        Write Python code for a module with all the roles in this role
+        """
+        self._write_python_code_header(out)
+        handlers = self._write_python_code_handlers(out)
+        self.write_python_code_role(out, "Role", handlers=handlers)
+
+    def _write_python_code_header(self, out: TextIO):
+        """
+        Write the imports at the top of the generated module
+        """
+        out.write(
+            "from __future__ import annotations\n"
+            "from typing import Any\n"
+            "import os\n"
+            "from transilience import role\n"
+            "from transilience.actions import builtin, facts\n"
+            "\n"
+        )
+
+    def _write_python_code_handlers(self, out: TextIO) -> Dict[str, str]:
+        """
+        Write the Role classes of all handlers, and return a dict mapping
+        handler names to the names of their classes
+        """
         handlers: Dict[str, str] = {}
         for name, handler in self.handlers.items():
-            lines += handler.get_python_code_role()
-            lines.append("")
+            handler.write_python_code_role(out)
+            out.write("\n")
             handlers[name] = handler.get_python_name()
-
-        lines += self.get_python_code_role("Role", handlers=handlers)
-
-        return lines
+        return handlers
 
     def get_python_name(self) -> str:
-        name_components = re.sub(r"[^A-Za-z]+", " ", self.name).split()
-        return "".join(c.capitalize() for c in name_components)
-
-    def get_python_code_role(self, name=None, handlers: Optional[Dict[str, str]] = None) -> List[str]:
+        if self._python_name is None:
+            if self.name.isascii():
+                name_components = self.name.translate(python_name_table).split()
+            else:
+                name_components = re_python_name_separator.split(self.name)
+            self._python_name = "".join([c.capitalize() for c in name_components])
+        return self._python_name
+
+    def write_python_code_role(self, out: TextIO, name=None, handlers: Optional[Dict[str, str]] = None):
+        """
+        Write Python code for the Role class of this role
+        """
         if handlers is None:
             handlers = {}
 
-        lines = []
         if self.uses_facts:
-            lines.append("@role.with_facts([facts.Platform])")
+            out.write("@role.with_facts([facts.Platform])\n")
 
         if name is None:
             name = self.get_python_name()
 
-        lines.append(f"class {name}(role.Role):")
+        out.write(f"class {name}(role.Role):\n")
 
-        role_vars = self.list_role_vars()
+        role_vars = self.sorted_role_vars()
 
         if role_vars:
-            lines.append("    # Role variables used by templates")
-            for name in sorted(role_vars):
-                lines.append(f"    {name}: Any = None")
-            lines.append("")
+            out.write("    # Role variables used by templates\n")
+            for name in role_vars:
+                out.write(f"    {name}: Any = None\n")
+            out.write("\n")
 
         if self.uses_facts:
-            lines.append("    def all_facts_available(self):")
+            out.write("    def all_facts_available(self):\n")
         else:
-            lines.append("    def start(self):")
+            out.write("    def start(self):\n")
 
+        writelines = out.writelines
         for task in self.tasks:
-            for line in task.get_python(handlers=handlers):
-                lines.append(" " * 8 + line)
-
-        return lines
+            writelines([f"        {line}\n" for line in task.get_python(handlers=handlers)])
 
 
 class AnsibleRoleFilesystem(AnsibleRole):
-    def __init__(self, name: str, root: str, uses_facts: bool = True):
+    __slots__ = ("root",)
+
+    def __init__(
+            self, name: str, root: str, uses_facts: bool = True,
+            template_engine: Optional[template.Engine] = None):
         super().__init__(name, uses_facts=uses_facts)
         self.root = root
-        self.template_engine: template.Engine = template.EngineFilesystem([self.root])
+        if template_engine is None:
+            template_engine = template.EngineFilesystem([self.root])
+        self.template_engine: template.Engine = template_engine
 
     def create_handler_role(self, name: str) -> "AnsibleRoleFilesystem":
-        return AnsibleRoleFilesystem(name, root=self.root, uses_facts=False)
+        return AnsibleRoleFilesystem(
+                name, root=self.root, uses_facts=False, template_engine=self.template_engine)
 
 
 class AnsibleRoleZip(AnsibleRole):
-    def __init__(self, name: str, archive: zipfile.ZipFile, root: str, uses_facts: bool = True):
+    __slots__ = ("root", "archive")
+
+    def __init__(
+            self, name: str, archive: zipfile.ZipFile, root: str, uses_facts: bool = True,
+            template_engine: Optional[template.Engine] = None):
         super().__init__(name, uses_facts=uses_facts)
         self.root = root
         self.archive = archive
-        self.template_engine: template.Engine = template.EngineZip(archive=archive, root=root)
+        if template_engine is None:
+            template_engine = template.EngineZip(archive=archive, root=root)
+        self.template_engine: template.Engine = template_engine
 
     def get_role_class_fields(self):
         fields = super().get_role_class_fields()
@@ -219,4 +313,6 @@ class AnsibleRoleZip(AnsibleRole):
         return fields
 
     def create_handler_role(self, name: str) -> "AnsibleRoleZip":
-        return AnsibleRoleZip(name, archive=self.archive, root=self.root, uses_facts=False)
+        return AnsibleRoleZip(
+                name, archive=self.archive, root=self.root, uses_facts=False,
+                template_engine=self.template_engine)
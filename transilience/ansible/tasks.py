@@ -1,5 +1,5 @@
 from __future__ import annotations
-from typing import TYPE_CHECKING, Type, Dict, Any, Optional, Callable, Sequence, List
+from typing import TYPE_CHECKING, Type, Dict, Any, Optional, Sequence, List, Tuple, Callable
 from dataclasses import fields
 from ..actions import builtin
 from ..role import Role
@@ -13,22 +13,86 @@ if TYPE_CHECKING:
     from .conditionals import Conditional
     YamlDict = Dict[str, Any]
 
+# Maximum length of generated code lines, not counting the indentation of the
+# method body they are in
+MAX_LINE_LENGTH = 112
+
+# Cache of dataclass fields of action classes
+_action_fields: Dict[Type[Action], Tuple[Field, ...]] = {}
+
+
+def get_action_fields(action_cls: Type[Action]) -> Tuple[Field, ...]:
+    """
+    Return the dataclass fields of an action class, computing them only once
+    per class
+    """
+    res = _action_fields.get(action_cls)
+    if res is None:
+        res = _action_fields[action_cls] = fields(action_cls)
+    return res
+
+
+class TaskStarter:
+    """
+    Callable that adds the action of a task to a role
+    """
+    __slots__ = ("action_cls", "constants", "getters", "name", "notify")
+
+    def __init__(
+            self, action_cls: Type[Action], parameters: Dict[str, Parameter],
+            name: Optional[str], notify: Optional[List[Type[Role]]]):
+        self.action_cls = action_cls
+        # Action arguments whose value does not depend on the role, evaluated
+        # only once and shared by all actions
+        self.constants: Dict[str, Any] = {}
+        # Bound get_value methods of the parameters that need to be evaluated
+        # for each action
+        getters: List[Tuple[str, Callable[[Role], Any]]] = []
+        for pname, p in parameters.items():
+            if p.constant:
+                # Constant parameters do not use the role
+                self.constants[pname] = p.get_value(None)  # type: ignore[arg-type]
+            else:
+                getters.append((pname, p.get_value))
+        self.getters: Tuple[Tuple[str, Callable[[Role], Any]], ...] = tuple(getters)
+        self.name = name
+        self.notify = notify
+
+    def __call__(self, role: Role):
+        getters = self.getters
+        if getters:
+            args = dict(self.constants)
+            for name, get_value in getters:
+                args[name] = get_value(role)
+        else:
+            # Keyword argument unpacking makes a new dict anyway, so there is
+            # no need to copy constants
+            args = self.constants
+        role.add(self.action_cls(**args), name=self.name, notify=self.notify)
+
 
 class Task:
     """
     Information extracted from a task in an Ansible playbook
     """
+    __slots__ = ("action_cls", "parameters", "task_info", "transilience_name", "notify", "conditionals",
+                 "_python_args", "_jsonable")
+
     def __init__(self, action_cls: Type[Action], args: YamlDict, task_info: YamlDict, transilience_name: str):
         self.action_cls = action_cls
         self.parameters: Dict[str, Parameter] = {}
         self.task_info = task_info
         self.transilience_name = transilience_name
-        # List of python names of handler roles notified by this task
+        # Handler roles notified by this task
         self.notify: List[AnsibleRole] = []
         self.conditionals: List[Conditional] = []
+        # Python code for the action arguments, computed by get_python
+        self._python_args: Optional[List[str]] = None
+        # Cached result of to_jsonable
+        self._jsonable: Optional[Dict[str, Any]] = None
 
         # Build parameter list
-        for f in fields(self.action_cls):
+        for f in get_action_fields(self.action_cls):
             value = args.pop(f.name, None)
             if value is None:
                 continue
@@ -44,66 +108,88 @@ class Task:
         """
         List the names of role variables used by this task
         """
+        res: List[str] = []
         for p in self.parameters.values():
-            yield from p.list_role_vars(role)
+            res.extend(p.list_role_vars(role))
         for c in self.conditionals:
-            yield from c.list_role_vars()
+            res.extend(c.list_role_vars())
+        return res
 
     def to_jsonable(self) -> Dict[str, Any]:
-        return {
-            "node": "task",
-            "action": self.transilience_name,
-            "parameters": {name: p.to_jsonable() for name, p in self.parameters.items()},
-            "ansible_yaml": self.task_info,
-            "notify": [h.get_python_name() for h in self.notify],
-            "conditionals": [c.to_jsonable() for c in self.conditionals],
-        }
-
-    def get_start_func(self, handlers: Optional[Dict[str, Callable[[], None]]] = None):
+        # Tasks do not change after AnsibleRole.add_task has set them up, so
+        # this is computed only once
+        if self._jsonable is None:
+            self._jsonable = {
+                "node": "task",
+                "action": self.transilience_name,
+                "parameters": {name: p.to_jsonable() for name, p in self.parameters.items()},
+                "ansible_yaml": self.task_info,
+                "notify": [h.get_python_name() for h in self.notify],
+                "conditionals": [c.to_jsonable() for c in self.conditionals],
+            }
+        return self._jsonable
+
+    def get_start_func(self, handlers: Optional[Dict[str, Type[Role]]] = None) -> TaskStarter:
+        if handlers is None:
+            handlers = {}
+
         # If this task calls handlers, fetch the corresponding handler classes
-        notify = self.task_info.get("notify")
-        if not notify:
-            notify_classes = None
+        if self.notify:
+            notify_classes = [handlers[h.name] for h in self.notify]
         else:
-            notify_classes = []
-            if isinstance(notify, str):
-                notify = [notify]
-            for name in notify:
-                notify_classes.append(handlers[name])
+            notify_classes = None
 
-        def starter(role: Role):
-            args = {name: p.get_value(role) for name, p in self.parameters.items()}
-            role.add(self.action_cls(**args), name=self.task_info.get("name"), notify=notify_classes)
-        return starter
+        return TaskStarter(self.action_cls, self.parameters, self.task_info.get("name"), notify_classes)
 
     def get_python(self, handlers: Optional[Dict[str, str]] = None) -> List[str]:
         if handlers is None:
             handlers = {}
 
-        fmt_args = []
-        for name, parm in self.parameters.items():
-            fmt_args.append(f"{name}={parm!r}")
+        # Parameters do not change after the task is loaded, so their code
+        # can be generated only once
+        if self._python_args is None:
+            self._python_args = [f"{name}={parm!r}" for name, parm in self.parameters.items()]
+        fmt_args = self._python_args
         act_args = ", ".join(fmt_args)
 
-        add_args = [
-            f"{self.transilience_name}({act_args})",
-            f"name={self.task_info['name']!r}"
-        ]
+        add_args = [f"name={self.task_info['name']!r}"]
 
-        if len(self.notify) == 1:
-            add_args.append(f"notify={self.notify[0].get_python_name()}")
-        elif len(self.notify) > 1:
-            add_args.append(f"notify=[{', '.join(n.get_python_name() for n in self.notify)}]")
+        if self.notify:
+            if len(self.notify) == 1:
+                add_args.append(f"notify={self.notify[0].get_python_name()}")
+            else:
+                add_args.append(f"notify=[{', '.join([n.get_python_name() for n in self.notify])}]")
 
         lines = []
         if self.conditionals:
             if len(self.conditionals) > 1:
-                lines.append(f"if {' and '.join(c.get_python_code() for c in self.conditionals)}:")
+                lines.append(f"if {' and '.join([c.get_python_code() for c in self.conditionals])}:")
             else:
                 lines.append(f"if {self.conditionals[0].get_python_code()}:")
-            lines.append(f"    self.add({', '.join(add_args)})")
+            indent = "    "
         else:
-            lines.append(f"self.add({', '.join(add_args)})")
+            indent = ""
+
+        # Emit the self.add() call on one line if it fits, else wrap it one
+        # argument per line
+        action = f"{self.transilience_name}({act_args})"
+        line = f"{indent}self.add({action}, {', '.join(add_args)})"
+        if len(line) <= MAX_LINE_LENGTH:
+            lines.append(line)
+            return lines
+
+        lines.append(f"{indent}self.add(")
+        line = f"{indent}    {action},"
+        if len(line) <= MAX_LINE_LENGTH:
+            lines.append(line)
+        else:
+            lines.append(f"{indent}    {self.transilience_name}(")
+            for arg in fmt_args:
+                lines.append(f"{indent}        {arg},")
+            lines.append(f"{indent}    ),")
+        for arg in add_args:
+            lines.append(f"{indent}    {arg},")
+        lines.append(f"{indent})")
 
         return lines
 
@@ -113,6 +199,8 @@ class TaskTemplate(Task):
     Task that maps ansible.builtin.template module to a Transilince
     builtin.copy action, plus template rendering on the Role's side
     """
+    __slots__ = ()
+
     def __init__(self, args: YamlDict, task_info: YamlDict):
         super().__init__(builtin.copy, args, task_info, "builtin.copy")
 
@@ -1,9 +1,11 @@
 from __future__ import annotations
-from typing import List, Union, Optional, Iterator, Sequence
+from typing import Dict, List, Union, Optional, Iterator, Sequence
 from contextlib import contextmanager
 import subprocess
 import tempfile
 import logging
+import locale
+import mmap
 import shutil
 import shlex
 import os
@@ -13,6 +15,29 @@ from .actions import Action
 
 log = logging.getLogger(__name__)
 
+# Size of the buffers used to compare file contents
+COMPARE_BUFSIZE = 1024 * 1024
+
+
+def files_equal(path1: str, path2: str) -> bool:
+    """
+    Check if two files have the same contents, reading them in chunks.
+
+    Files of different sizes are detected without reading them
+    """
+    with open(path1, "rb") as fd1, open(path2, "rb") as fd2:
+        if os.fstat(fd1.fileno()).st_size != os.fstat(fd2.fileno()).st_size:
+            return False
+        buf1 = memoryview(bytearray(COMPARE_BUFSIZE))
+        buf2 = memoryview(bytearray(COMPARE_BUFSIZE))
+        while True:
+            size1 = fd1.readinto(buf1)
+            size2 = fd2.readinto(buf2)
+            if size1 != size2 or buf1[:size1] != buf2[:size2]:
+                return False
+            if not size1:
+                return True
+
 
 class Chroot(System):
     """
@@ -56,11 +81,9 @@ class Chroot(System):
         """
         Atomically write/replace the file with the given content
         """
-        dest = self.abspath(relpath)
-        os.makedirs(os.path.dirname(dest), exist_ok=True)
-        if os.path.lexists(dest):
-            os.unlink(dest)
-        with atomic_writer(dest, "wt") as fd:
+        # atomic_writer creates missing parent directories, and renames over
+        # any existing file
+        with atomic_writer(self.abspath(relpath), "wt") as fd:
             fd.write(contents)
 
     def write_symlink(self, relpath: str, target: str):
@@ -68,9 +91,13 @@ class Chroot(System):
         Write/replace the file with a symlink to the given target
         """
         dest = self.abspath(relpath)
-        os.makedirs(os.path.basename(dest), exist_ok=True)
-        if os.path.lexists(dest):
+        parent = os.path.dirname(dest)
+        if not os.path.isdir(parent):
+            os.makedirs(parent, exist_ok=True)
+        try:
             os.unlink(dest)
+        except FileNotFoundError:
+            pass
         os.symlink(target, dest)
 
     @contextmanager
@@ -118,6 +145,25 @@ class Chroot(System):
         if not os.path.exists(pathname):
             return False
 
+        # Look for search in the raw file contents first, to avoid reading and
+        # decoding files that do not need changing. This is skipped if search
+        # contains line endings, since reading in text mode translates them,
+        # or characters that cannot be encoded in the file encoding
+        needle: Optional[bytes] = None
+        if search and "\n" not in search and "\r" not in search:
+            try:
+                needle = search.encode(locale.getpreferredencoding(False))
+            except UnicodeEncodeError:
+                pass
+
+        if needle is not None:
+            with open(pathname, "rb") as fd:
+                if os.fstat(fd.fileno()).st_size == 0:
+                    return False
+                with mmap.mmap(fd.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    if mm.find(needle) == -1:
+                        return False
+
         with open(pathname, "rt") as fd:
             original = fd.read()
 
@@ -140,16 +186,16 @@ class Chroot(System):
         dest = self.abspath(dst_relpath)
         if os.path.exists(dest):
             # Do not install it twice if it didn't change
-            with open(src, "rb") as fd:
-                src_contents = fd.read()
-            with open(dest, "rb") as fd:
-                dst_contents = fd.read()
-            if src_contents == dst_contents:
+            if files_equal(src, dest):
                 return False
 
-        os.makedirs(os.path.dirname(dest), exist_ok=True)
-        if os.path.exists(dest):
+        parent = os.path.dirname(dest)
+        if not os.path.isdir(parent):
+            os.makedirs(parent, exist_ok=True)
+        try:
             os.unlink(dest)
+        except FileNotFoundError:
+            pass
         shutil.copy(src, dest)
         return True
 
@@ -165,11 +211,23 @@ class Chroot(System):
         # Remove destination if it exists
         if os.path.isdir(dest):
             shutil.rmtree(dest)
-        elif os.path.exists(dest):
-            os.unlink(dest)
+        else:
+            try:
+                os.unlink(dest)
+            except FileNotFoundError:
+                pass
 
         if os.path.isdir(src):
-            shutil.copytree(src, dest)
+            # Like shutil.copytree, create missing parent directories
+            os.makedirs(os.path.dirname(dest), exist_ok=True)
+            # Use cp to let the kernel clone or copy file data without going
+            # through Python. Like shutil.copytree, follow symlinks and keep
+            # mode, timestamps and extended attributes, but not ownership.
+            # With --preserve=all, cp does not fail if extended attributes
+            # cannot be preserved, like copystat
+            subprocess.run(
+                ["cp", "--recursive", "--dereference", "--preserve=all", "--no-preserve=ownership,links",
+                 "--reflink=auto", "--", src, dest], check=True)
         else:
             shutil.copy(src, dest)
 
@@ -191,8 +249,10 @@ class Chroot(System):
         try:
             yield tmppath
         finally:
-            if os.path.lexists(abspath):
+            try:
                 os.unlink(abspath)
+            except FileNotFoundError:
+                pass
             if tmppath is not None:
                 os.rename(tmppath, abspath)
 
@@ -206,40 +266,69 @@ class Chroot(System):
             shutil.copy("/etc/resolv.conf", self.abspath("/etc/resolvconf"))
             yield
 
-    def systemctl_enable(self, unit: str):
+    def c_env(self) -> Dict[str, str]:
+        """
+        Return the environment to use to run commands, with LANG=C so that
+        their output can be parsed.
+
+        This is built on each call, to pick up changes to os.environ
         """
-        Enable (and if needed unmask) the given systemd unit
+        return {**os.environ, "LANG": "C"}
+
+    def systemctl_enable(self, unit: Union[str, List[str]]):
+        """
+        Enable (and if needed unmask) the given systemd unit(s)
         """
+        units = [unit] if isinstance(unit, str) else unit
+        if not units:
+            return
+
         with self.working_resolvconf():
-            env = dict(os.environ)
-            env["LANG"] = "C"
-            subprocess.run(["systemctl", "--root=" + self.root, "enable", unit], check=True, env=env)
-            subprocess.run(["systemctl", "--root=" + self.root, "unmask", unit], check=True, env=env)
+            env = self.c_env()
+            subprocess.run(["systemctl", "--root=" + self.root, "enable"] + units, check=True, env=env)
+            subprocess.run(["systemctl", "--root=" + self.root, "unmask"] + units, check=True, env=env)
 
-    def systemctl_disable(self, unit: str, mask=True):
+    def systemctl_disable(self, unit: Union[str, List[str]], mask=True):
         """
-        Disable (and optionally mask) the given systemd unit
+        Disable (and optionally mask) the given systemd unit(s)
         """
+        units = [unit] if isinstance(unit, str) else unit
+        if not units:
+            return
+
         with self.working_resolvconf():
-            env = dict(os.environ)
-            env["LANG"] = "C"
-            subprocess.run(["systemctl", "--root=" + self.root, "disable", unit], check=True, env=env)
+            env = self.c_env()
+            subprocess.run(["systemctl", "--root=" + self.root, "disable"] + units, check=True, env=env)
             if mask:
-                subprocess.run(["systemctl", "--root=" + self.root, "mask", unit], check=True, env=env)
+                subprocess.run(["systemctl", "--root=" + self.root, "mask"] + units, check=True, env=env)
 
-    def run(self, cmd: List[str], check=True, **kw) -> subprocess.CompletedProcess:
+    def run(self, cmd: List[str], check=True, ephemeral=False, **kw) -> subprocess.CompletedProcess:
         """
-        Run the given command inside the chroot
+        Run the given command inside the chroot.
+
+        If ephemeral is True, changes made by the command to the chroot are
+        discarded when it ends. This is only useful for commands that do not
+        need to change the chroot
         """
         log.info("%s: running %s", self.root, " ".join(shlex.quote(x) for x in cmd))
         chroot_cmd = ["systemd-nspawn", "-D", self.root]
+        if ephemeral:
+            # Run on a tmpfs overlay over the chroot. Without --read-only,
+            # systemd-nspawn would still take an exclusive lock on the
+            # directory
+            chroot_cmd.extend(("--volatile=overlay", "--read-only"))
         chroot_cmd.extend(cmd)
         if "env" not in kw:
-            kw["env"] = dict(os.environ)
-            kw["env"]["LANG"] = "C"
+            kw["env"] = self.c_env()
         with self.working_resolvconf():
             return subprocess.run(chroot_cmd, check=check, **kw)
 
+    def is_installed(self, pkg: str) -> bool:
+        """
+        Check if the given package is installed in the chroot
+        """
+        return os.path.exists(os.path.join(self.root, "var", "lib", "dpkg", "info", pkg + ".list"))
+
     def apt_install(self, pkglist: Union[str, List[str]], recommends=False):
         """
         Install the given package(s), if they are not installed yet
@@ -251,15 +340,10 @@ class Chroot(System):
         if not recommends:
             cmd.append("--no-install-recommends")
 
-        has_packages = False
-        for pkg in pkglist:
-            if os.path.exists(os.path.join(self.root, "var", "lib", "dpkg", "info", pkg + ".list")):
-                continue
-            cmd.append(pkg)
-            has_packages = True
-
-        if not has_packages:
+        to_install = [pkg for pkg in pkglist if not self.is_installed(pkg)]
+        if not to_install:
             return
+        cmd.extend(to_install)
 
         self.run(cmd)
 
@@ -271,15 +355,10 @@ class Chroot(System):
             pkglist = [pkglist]
 
         cmd = ["dpkg", "--purge"]
-        has_packages = False
-        for pkg in pkglist:
-            if not os.path.exists(os.path.join(self.root, "var", "lib", "dpkg", "info", pkg + ".list")):
-                continue
-            cmd.append(pkg)
-            has_packages = True
-
-        if not has_packages:
+        to_purge = [pkg for pkg in pkglist if self.is_installed(pkg)]
+        if not to_purge:
             return
+        cmd.extend(to_purge)
 
         self.run(cmd)
 
@@ -1,5 +1,5 @@
 from __future__ import annotations
-from typing import TYPE_CHECKING, Iterator, Dict
+from typing import TYPE_CHECKING, Iterator, Dict, Any, Optional, Sequence
 from .utils import run
 from .system import Chroot
 import re
@@ -14,6 +14,18 @@ if TYPE_CHECKING:
 
 log = logging.getLogger(__name__)
 
+# Match a line of kpartx -av output for a newly mapped partition
+re_kpartx_mapping = re.compile(r"^add map (\S+)")
+
+
+def lsblk(paths: Sequence[str]) -> Dict[str, Dict[str, Any]]:
+    """
+    Run lsblk once for all the given devices, and return their information
+    indexed by device path
+    """
+    res = run(("lsblk", "--json", "--output-all", "--bytes", *paths), capture_output=True)
+    return {info.get("path"): info for info in json.loads(res.stdout)["blockdevices"]}
+
 
 class BlockDevice:
     """
@@ -53,14 +65,19 @@ class DiskImage(Disk):
         image, and shuts them down at the end
         """
         res = run(("kpartx", "-avs", self.path), text=True, capture_output=True)
-        devs = {}
-        re_mapping = re.compile(r"^add map (\S+)")
+        paths = []
         for line in res.stdout.splitlines():
-            mo = re_mapping.match(line)
+            mo = re_kpartx_mapping.match(line)
             if not mo:
                 log.error("Unrecognised kpartx output line: %r", line)
                 continue
-            dev = Partition(os.path.join("/dev/mapper", mo.group(1)))
+            paths.append(os.path.join("/dev/mapper", mo.group(1)))
+
+        # Query all partitions with a single lsblk run
+        infos = lsblk(paths) if paths else {}
+        devs = {}
+        for path in paths:
+            dev = Partition(path, info=infos.get(path))
             devs[dev.label] = dev
 
         try:
@@ -73,16 +90,28 @@ class Partition(BlockDevice):
     """
     Information and access to a block device for a disk partition
     """
-    def __init__(self, path: str):
+    def __init__(self, path: str, info: Optional[Dict[str, Any]] = None):
+        """
+        info, if provided, is the lsblk information for the device. If
+        missing, it is read by running lsblk
+        """
         self.path = path
-        self.refresh()
+        if info is None:
+            self.refresh()
+        else:
+            self.load_lsblk_info(info)
 
     def refresh(self):
         """
         Update device information from lsblk
         """
         info = run(("lsblk", "--json", "--output-all", "--bytes", self.path), capture_output=True)
-        info = json.loads(info.stdout)["blockdevices"][0]
+        self.load_lsblk_info(json.loads(info.stdout)["blockdevices"][0])
+
+    def load_lsblk_info(self, info: Dict[str, Any]):
+        """
+        Set device information from the lsblk JSON output for this device
+        """
         self.label = info.get("label")
         self.fstype = info.get("fstype")
 
@@ -1,10 +1,62 @@
 from __future__ import annotations
-from typing import Dict, Any, Optional, BinaryIO, ContextManager
+from typing import Dict, Any, Optional, BinaryIO, ContextManager, List, Iterator, Union
 import contextlib
+import functools
 import hashlib
+import os
 import zipfile
 import shutil
 
+# Size of the buffer used to read files when computing checksums
+HASH_BUFSIZE = 1024 * 1024
+
+# Contents of files up to this size are cached by FileAsset.sha1sum
+CACHE_MAX_SIZE = 16384
+
+
+def _read_chunks(fd: BinaryIO) -> Iterator[Union[bytes, memoryview]]:
+    """
+    Read a file in chunks of up to HASH_BUFSIZE bytes.
+
+    Real files are read into a reused buffer, no bigger than the file, to
+    avoid allocating a new bytes object for each chunk. In that case, each
+    chunk is only valid until the next one is read
+    """
+    try:
+        size = os.fstat(fd.fileno()).st_size
+    except OSError:
+        # Members of zip files have no file descriptor, and their readinto
+        # would read and copy the data anyway
+        size = None
+
+    if not size:
+        # Also used for files that report no size, like those in /proc
+        while True:
+            data = fd.read(HASH_BUFSIZE)
+            if not data:
+                return
+            yield data
+
+    buf = memoryview(bytearray(min(size, HASH_BUFSIZE)))
+    readinto = fd.readinto  # type: ignore[attr-defined]
+    while True:
+        size_read = readinto(buf)
+        if not size_read:
+            return
+        yield buf[:size_read]
+
+
+@functools.lru_cache(maxsize=32)
+def _open_zip(archive: str, mtime_ns: int, size: int) -> zipfile.ZipFile:
+    """
+    Return a ZipFile for the given archive, shared by all ZipFileAssets
+    referencing it, so that its central directory is only parsed once.
+
+    mtime_ns and size are only used as cache keys, to reopen the archive if
+    it changed on disk
+    """
+    return zipfile.ZipFile(archive, "r")
+
 
 class FileAsset:
     """
@@ -36,18 +88,15 @@ class FileAsset:
         """
         h = hashlib.sha1()
         size = 0
-        to_cache = []
+        to_cache: Optional[List[bytes]] = []
         with self.open() as fd:
-            while True:
-                buf = fd.read(40960)
-                if not buf:
-                    break
-                size += len(buf)
-                if size > 16384:
+            for chunk in _read_chunks(fd):
+                size += len(chunk)
+                if size > CACHE_MAX_SIZE:
                     to_cache = None
-                else:
-                    to_cache.append(buf)
-                h.update(buf)
+                elif to_cache is not None:
+                    to_cache.append(bytes(chunk))
+                h.update(chunk)
 
             if to_cache is not None:
                 self.cached = b"".join(to_cache)
@@ -56,14 +105,24 @@ class FileAsset:
 
     @classmethod
     def compute_file_sha1sum(self, fd: BinaryIO) -> str:
+        file_digest = getattr(hashlib, "file_digest", None)
+        if file_digest is not None:
+            # Python 3.11+
+            return file_digest(fd, "sha1").hexdigest()
+
         h = hashlib.sha1()
-        while True:
-            buf = fd.read(40960)
-            if not buf:
-                break
-            h.update(buf)
+        for chunk in _read_chunks(fd):
+            h.update(chunk)
         return h.hexdigest()
 
+    @classmethod
+    def close_caches(cls):
+        """
+        Drop the archives kept open to access ZipFileAssets
+        """
+        # ZipFile closes its file when garbage collected
+        _open_zip.cache_clear()
+
     @classmethod
     def deserialize(cls, data: Dict[str, Any]) -> "FileAsset":
         t = data.get("type")
@@ -118,6 +177,6 @@ class ZipFileAsset(FileAsset):
 
     @contextlib.contextmanager
     def open(self) -> ContextManager[BinaryIO]:
-        with zipfile.ZipFile(self.archive, "r") as zf:
-            with zf.open(self.path) as fd:
-                yield fd
+        st = os.stat(self.archive)
+        with _open_zip(self.archive, st.st_mtime_ns, st.st_size).open(self.path) as fd:
+            yield fd
@@ -123,7 +123,7 @@ class Playbook:
         Print the Python code generated from the given Ansible role
         """
         loader = self._load_ansible(name)
-        print(loader.get_python_code(), file=file)
+        print(loader.get_python_code(), file=file, end="")
 
     def role_to_ast(self, name: str, file=None):
         """
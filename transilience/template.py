@@ -1,9 +1,10 @@
 from __future__ import annotations
-from typing import Optional, List, Dict, Any, Sequence, Union
+from typing import Optional, List, Dict, Any, Sequence, Union, Tuple, Callable
 import zipfile
 import os
 import jinja2
 import jinja2.meta
+import jinja2.nodes
 
 
 def finalize_value(val):
@@ -29,12 +30,18 @@ class Engine:
                 keep_trailing_newline=True,
                 finalize=finalize_value,
                 loader=loader)
+        # Compiled string templates, indexed by their source
+        self.string_templates: Dict[str, jinja2.Template] = {}
+        # Compiled expressions and their parsed ASTs, indexed by their source
+        self.expressions: Dict[str, Tuple[Callable, jinja2.nodes.Node]] = {}
 
     def render_string(self, template: str, ctx: Dict[str, Any]) -> str:
         """
         Render a template from a string
         """
-        tpl = self.env.from_string(template)
+        tpl = self.string_templates.get(template)
+        if tpl is None:
+            tpl = self.string_templates[template] = self.env.from_string(template)
         return tpl.render(**ctx)
 
     def render_file(self, path: str, ctx: Dict[str, Any]) -> str: